@@ -0,0 +1,106 @@
+"""
+Dataset fetchers for the Grammy API.
+
+Each fetcher returns the Kaggle Grammy winners/nominees dataset as a pandas
+DataFrame. The server picks one with the GRAMMY_FETCHER env var:
+
+  - auto        kagglehub, falling back to the Kaggle REST API (default)
+  - kagglehub   kagglehub's pandas adapter
+  - kaggle-rest Kaggle REST API ZIP download (needs KAGGLE_USERNAME / KAGGLE_KEY)
+  - croissant   Croissant JSON-LD metadata via mlcroissant
+"""
+import io
+import os
+import shutil
+import zipfile
+import logging
+from typing import Callable, Dict
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pacsv
+
+logger = logging.getLogger(__name__)
+
+OWNER = "johnpendenque"
+SLUG = "grammy-winners-and-nominees-from-1965-to-2024"
+
+
+def fetch_grammy_data_kagglehub() -> pd.DataFrame:
+    import kagglehub
+    from kagglehub import KaggleDatasetAdapter
+    return kagglehub.load_dataset(KaggleDatasetAdapter.PANDAS, f"{OWNER}/{SLUG}", file_path="")
+
+
+def fetch_grammy_data_kaggle_rest() -> pd.DataFrame:
+    import requests
+    user = os.environ.get("KAGGLE_USERNAME")
+    key = os.environ.get("KAGGLE_KEY")
+    if not user or not key:
+        raise RuntimeError("KAGGLE_USERNAME and KAGGLE_KEY environment variables required for Kaggle REST fallback.")
+    url = f"https://www.kaggle.com/api/v1/datasets/download/{OWNER}/{SLUG}"
+    bio = io.BytesIO()
+    with requests.get(url, auth=(user, key), stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        # stream straight into the buffer; resp.content would hold a second full copy
+        resp.raw.decode_content = True
+        shutil.copyfileobj(resp.raw, bio)
+    bio.seek(0)
+    z = zipfile.ZipFile(bio)
+    csv_name = None
+    for name in z.namelist():
+        if name.lower().endswith('.csv'):
+            csv_name = name
+            break
+    if not csv_name:
+        raise RuntimeError("No CSV inside Kaggle dataset ZIP")
+    with z.open(csv_name) as fh:
+        # strings_can_be_null keeps pd.read_csv's behaviour of reading empty cells as NA
+        table = pacsv.read_csv(fh, read_options=pacsv.ReadOptions(use_threads=True),
+                               convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+    # Arrow types invalid UTF-8 columns as binary; let pandas replace the bad bytes instead
+    if any(pa.types.is_binary(f.type) for f in table.schema):
+        with z.open(csv_name) as fh:
+            return pd.read_csv(io.TextIOWrapper(fh, encoding='utf-8', errors='replace'))
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def fetch_grammy_data_croissant() -> pd.DataFrame:
+    import mlcroissant as mlc
+    logger.info("Fetching Kaggle dataset via MLCroissant...")
+    croissant_dataset = mlc.Dataset(f'https://www.kaggle.com/datasets/{OWNER}/{SLUG}/croissant/download')
+    record_sets = croissant_dataset.metadata.record_sets
+    logger.info(f"Found {len(record_sets)} record set(s): {[rs.name for rs in record_sets]}")
+    if not record_sets:
+        raise ValueError("No record sets found in Croissant dataset")
+    df = pd.DataFrame(croissant_dataset.records(record_set=record_sets[0].uuid))
+    # Croissant yields text fields as bytes
+    for col in df.columns:
+        first = df[col].dropna().head(1)
+        if len(first) and isinstance(first.iloc[0], bytes):
+            df[col] = df[col].str.decode('utf-8', errors='replace')
+    logger.info(f"Successfully loaded {len(df)} records")
+    return df
+
+
+def fetch_grammy_data_auto() -> pd.DataFrame:
+    # Try kagglehub first for convenience, then fallback to REST in-memory ZIP
+    try:
+        return fetch_grammy_data_kagglehub()
+    except Exception:
+        return fetch_grammy_data_kaggle_rest()
+
+
+FETCHERS: Dict[str, Callable[[], pd.DataFrame]] = {
+    'auto': fetch_grammy_data_auto,
+    'kagglehub': fetch_grammy_data_kagglehub,
+    'kaggle-rest': fetch_grammy_data_kaggle_rest,
+    'croissant': fetch_grammy_data_croissant,
+}
+
+
+def get_fetcher(name: str) -> Callable[[], pd.DataFrame]:
+    try:
+        return FETCHERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown GRAMMY_FETCHER {name!r}; expected one of {sorted(FETCHERS)}") from None
@@ -6,151 +6,211 @@ Usage:
   - Set Kaggle credentials via env vars: KAGGLE_USERNAME and KAGGLE_KEY (or configure kaggle.json)
   - Install requirements: pip install -r requirements.txt
   - Run: python grammy_server.py
+  - Production: gunicorn -c gunicorn_conf.py grammy_server:app
 
-The server will fetch the Kaggle dataset into memory (using kagglehub if available,
-or the Kaggle REST API as a fallback), build chart-friendly JSON, and expose
-`/api/grammy` for the browser to fetch. No files are written to disk.
+The server fetches the Kaggle dataset with the fetcher named by GRAMMY_FETCHER
+(see fetchers.py; default: kagglehub, or the Kaggle REST API as a fallback),
+builds chart-friendly JSON, and exposes `/api/grammy` for the browser to fetch.
+The first successful fetch is kept as a Parquet file (GRAMMY_CACHE_PATH,
+default: ~/.cache/grammy-server/grammy-<fetcher>.parquet) so restarts skip the download.
 """
 import os
-import io
-import zipfile
-import json
+import re
+import gzip
+import hashlib
+import tempfile
+import threading
 from functools import lru_cache
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Union
 
-from flask import Flask, jsonify, make_response
-from flask import current_app
+from flask import Flask, Response, jsonify, make_response, request
 
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from fetchers import get_fetcher
 
 app = Flask(__name__)
 
+GRAMMY_FETCHER = os.environ.get("GRAMMY_FETCHER", "auto")
+# Resolved at import so an unknown GRAMMY_FETCHER fails at startup instead of on every request
+fetch_grammy_data = get_fetcher(GRAMMY_FETCHER)
+# Keep the cache in a per-user directory; a file other users can plant would be deserialized on startup
+GRAMMY_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "grammy-server")
+GRAMMY_CACHE_PATH = os.environ.get(
+    "GRAMMY_CACHE_PATH", os.path.join(GRAMMY_CACHE_DIR, f"grammy-{GRAMMY_FETCHER}.parquet"))
+
+# Bounds for parsed years; values outside them are treated as missing
+MIN_YEAR, MAX_YEAR = 1000, 3000
+
+BIG4_KEYWORDS = ['record of the year', 'album of the year', 'song of the year', 'best new artist']
+BIG4_PATTERN = '|'.join(re.escape(k) for k in BIG4_KEYWORDS)
+
+
+# lru_cache doesn't lock, so without this a request arriving mid warm-up would start a second fetch.
+# Reentrant because building the payload loads the dataframe under the same lock.
+_LOAD_LOCK = threading.RLock()
+
+
+def load_grammy_dataframe() -> pd.DataFrame:
+    with _LOAD_LOCK:
+        return _load_grammy_dataframe()
+
 
-def try_kagglehub_df() -> pd.DataFrame:
+@lru_cache(maxsize=1)
+def _load_grammy_dataframe() -> pd.DataFrame:
+    if os.path.exists(GRAMMY_CACHE_PATH):
+        try:
+            return pq.read_table(GRAMMY_CACHE_PATH).to_pandas(types_mapper=pd.ArrowDtype)
+        except Exception:
+            pass  # unreadable cache, fetch again
+    df = fetch_grammy_data()
     try:
-        import kagglehub
-        from kagglehub import KaggleDatasetAdapter
-        owner_slug = "johnpendenque/grammy-winners-and-nominees-from-1965-to-2024"
-        df = kagglehub.load_dataset(KaggleDatasetAdapter.PANDAS, owner_slug, file_path="")
-        return df
+        table = pa.Table.from_pandas(df, preserve_index=False)
     except Exception:
-        raise
-
-
-def try_kaggle_zip_in_memory() -> pd.DataFrame:
-    import requests
-    owner = "johnpendenque"
-    slug = "grammy-winners-and-nominees-from-1965-to-2024"
-    user = os.environ.get("KAGGLE_USERNAME")
-    key = os.environ.get("KAGGLE_KEY")
-    if not user or not key:
-        raise RuntimeError("KAGGLE_USERNAME and KAGGLE_KEY environment variables required for Kaggle REST fallback.")
-    url = f"https://www.kaggle.com/api/v1/datasets/download/{owner}/{slug}"
-    resp = requests.get(url, auth=(user, key), stream=True, timeout=60)
-    resp.raise_for_status()
-    bio = io.BytesIO(resp.content)
-    z = zipfile.ZipFile(bio)
-    csv_name = None
-    for name in z.namelist():
-        if name.lower().endswith('.csv'):
-            csv_name = name
-            break
-    if not csv_name:
-        raise RuntimeError("No CSV inside Kaggle dataset ZIP")
-    with z.open(csv_name) as fh:
-        return pd.read_csv(io.TextIOWrapper(fh, encoding='utf-8', errors='replace'))
+        return df
+    write_parquet_cache(table)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
 
 
-@lru_cache(maxsize=1)
-def load_grammy_dataframe() -> pd.DataFrame:
-    # Try kagglehub first for convenience, then fallback to REST in-memory ZIP
+def write_parquet_cache(table: pa.Table) -> None:
+    # Write to a temp file beside the cache and swap it in, so readers never see a partial file
+    tmp_path = None
     try:
-        return try_kagglehub_df()
+        cache_dir = os.path.dirname(GRAMMY_CACHE_PATH) or '.'
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.parquet.tmp')
+        os.close(fd)
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, GRAMMY_CACHE_PATH)
     except Exception:
-        return try_kaggle_zip_in_memory()
+        # caching is best effort
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 
-def build_payload(df: pd.DataFrame) -> Dict[str, Any]:
+def detect_columns(cols: List[str]) -> Dict[str, Optional[str]]:
     # Basic heuristics to find columns
-    cols = [c for c in df.columns]
-    year_col = next((c for c in cols if 'year' in c.lower() or 'date' in c.lower()), None)
-    genre_col = next((c for c in cols if 'genre' in c.lower() or 'category' in c.lower()), None)
-    artist_col = next((c for c in cols if 'artist' in c.lower() or 'performer' in c.lower() or 'name' in c.lower()), None)
-    winner_col = next((c for c in cols if 'winner' in c.lower() or 'result' in c.lower() or 'won' in c.lower()), None)
+    def find(*keys: str) -> Optional[str]:
+        return next((c for c in cols if any(k in c.lower() for k in keys)), None)
+    return {
+        "year": find('year', 'date'),
+        "genre": find('genre', 'category'),
+        "artist": find('artist', 'performer', 'name'),
+        "winner": find('winner', 'result', 'won'),
+        "category": find('category', 'award'),
+    }
 
-    # Polar: genre counts
-    gcol = genre_col or genre_col
-    if gcol and gcol in df.columns:
-        polar_series = df[gcol].fillna('Unknown').astype(str)
+
+def parse_years(values: pd.Series) -> pa.Array:
+    # Nullable int16 years; anything unparseable or outside MIN_YEAR..MAX_YEAR becomes null
+    def as_float(years: pd.Series) -> np.ndarray:
+        # NaN and NA both end up as NaN, whatever backing the series has; copied since Arrow-backed views are read-only
+        return np.array(years.to_numpy(dtype='float64', na_value=np.nan))
+
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        years = as_float(values.dt.year)
     else:
-        polar_series = pd.Series(['Unknown'] * len(df))
-    polar_counts = polar_series.value_counts().to_dict()
-    polar = {"labels": list(polar_counts.keys()), "data": list(polar_counts.values())}
+        years = as_float(pd.to_numeric(values, errors='coerce'))
+        unparsed = np.isnan(years) & values.notna().to_numpy(bool)
+        if unparsed.any():
+            # date strings such as '2020-01-05'
+            try:
+                dates = pd.to_datetime(values[unparsed], errors='coerce', format='mixed')
+                years[unparsed] = as_float(dates.dt.year)
+            except Exception:
+                pass
+    valid = ~np.isnan(years) & (years >= MIN_YEAR) & (years <= MAX_YEAR)
+    return pa.array(np.where(valid, years, 0).astype(np.int16), mask=~valid)
+
+
+def build_payload(df: Union[pd.DataFrame, pa.Table]) -> Dict[str, Any]:
+    if isinstance(df, pa.Table):
+        df = df.to_pandas(types_mapper=pd.ArrowDtype)
+    cols = [str(c) for c in df.columns]
+    found = detect_columns(cols)
+    year_col, genre_col, artist_col = found["year"], found["genre"], found["artist"]
+    winner_col, cat_col = found["winner"], found["category"]
+
+    if genre_col:
+        genre_str = df[genre_col].fillna('Unknown').astype('string[pyarrow]')
+    else:
+        genre_str = pd.Series('Unknown', index=df.index, dtype='string[pyarrow]')
+    genre_arr = pa.array(genre_str)
+
+    # Polar: genre counts
+    polar_counts = pc.value_counts(genre_arr)
+    order = pc.sort_indices(polar_counts.field('counts'), sort_keys=[('', 'descending')])
+    polar_counts = polar_counts.take(order)
+    polar = {"labels": polar_counts.field('values').to_pylist(), "data": polar_counts.field('counts').to_pylist()}
 
     # Evolution by year x genre
+    # Years stay in a local int16 array; the cached dataframe is shared across requests and never written to
     if year_col and year_col in df.columns:
-        try:
-            years = pd.to_datetime(df[year_col], errors='coerce').dt.year.fillna(df[year_col]).astype('Int64')
-        except Exception:
-            years = pd.to_numeric(df[year_col], errors='coerce').astype('Int64')
-        df['_GRAMMY_YEAR'] = years
+        year_arr = parse_years(df[year_col])
+    else:
+        year_arr = pa.nulls(len(df), pa.int16())
+    tbl = pa.table({'year': year_arr, 'genre': genre_arr})
+    tbl = tbl.filter(pc.is_valid(tbl['year']))
+    counts = tbl.group_by(['year', 'genre']).aggregate([([], 'count_all')])
+    year_keys = pc.unique(counts['year'])
+    year_keys = year_keys.take(pc.array_sort_indices(year_keys))
+    genre_keys = pc.unique(counts['genre'])
+    genre_keys = genre_keys.take(pc.array_sort_indices(genre_keys))
+    vals = np.zeros((len(year_keys), len(genre_keys)), dtype=np.int32)
+    row_idx = pc.index_in(counts['year'], value_set=year_keys).to_numpy()
+    col_idx = pc.index_in(counts['genre'], value_set=genre_keys).to_numpy()
+    vals[row_idx, col_idx] = counts['count_all'].to_numpy()
+    labels = [str(y) for y in year_keys.to_pylist()]
+    palette = ["#ec4899","#3b82f6","#6366f1","#10b981","#f97316","#a78bfa"]
+    datasets = [
+        {"label": g, "data": vals[:, i].tolist(), "backgroundColor": palette[i % len(palette)], "borderColor": palette[i % len(palette)]}
+        for i, g in enumerate(genre_keys.to_pylist())
+    ]
+    evolution = {"labels": labels, "datasets": datasets}
+
+    # Winner flag, normalised once for both the scatter and big4 sections
+    if winner_col and winner_col in df.columns:
+        win_str = df[winner_col].astype('string[pyarrow]').str.strip().str.lower()
+        is_win = win_str.str.contains(r'win|^(?:yes|y|true|1(?:\.0)?)$', regex=True).fillna(False)
     else:
-        df['_GRAMMY_YEAR'] = pd.NA
-    gcol = genre_col if genre_col and genre_col in df.columns else (cols[0] if cols else None)
-    if gcol:
-        pivot = pd.crosstab(df['_GRAMMY_YEAR'], df[gcol].fillna('Unknown').astype(str))
-        pivot = pivot.sort_index()
-        labels = [str(int(y)) for y in pivot.index if pd.notna(y)]
-        datasets = []
-        palette = ["#ec4899","#3b82f6","#6366f1","#10b981","#f97316","#a78bfa"]
-        for i, g in enumerate(pivot.columns):
-            datasets.append({"label": g, "data": [int(x) for x in pivot[g].tolist()], "backgroundColor": palette[i % len(palette)], "borderColor": palette[i % len(palette)]})
-        evolution = {"labels": labels, "datasets": datasets}
+        is_win = pd.Series(False, index=df.index)
+    is_win = is_win.astype(bool)
+
+    # Scatter: win efficiency per artist, counted over factorized artist codes
+    if artist_col and artist_col in df.columns:
+        artists = df[artist_col].astype(object).where(df[artist_col].notna(), 'Unknown').astype(str)
     else:
-        evolution = {"labels": [], "datasets": []}
-
-    # Scatter: win efficiency per artist
-    stats = {}
-    for _, row in df.iterrows():
-        artist = str(row[artist_col]) if artist_col and pd.notna(row.get(artist_col, None)) else 'Unknown'
-        rec = stats.setdefault(artist, {"wins": 0, "noms": 0})
-        rec['noms'] += 1
-        if winner_col and pd.notna(row.get(winner_col, None)):
-            v = row[winner_col]
-            if isinstance(v, str):
-                is_win = 'win' in v.lower() or 'winner' in v.lower() or v.strip().lower() in ('yes','y','true','1')
-            else:
-                is_win = bool(v)
-            if is_win:
-                rec['wins'] += 1
-    points = []
-    for a, st in stats.items():
-        noms = st['noms']
-        wins = st['wins']
-        eff = (wins / noms * 100) if noms else 0.0
-        points.append({"artist": a, "x": max(1, noms), "y": round(eff, 2), "r": max(4, min(40, wins*4))})
+        artists = pd.Series('Unknown', index=df.index)
+    codes, uniques = pd.factorize(artists, sort=False)
+    win_flags = is_win.to_numpy(np.int64)
+    # Narrow ints and a single decimal keep the arrays and the JSON they turn into small
+    noms = np.bincount(codes, minlength=len(uniques)).astype(np.int32)
+    wins = np.bincount(codes, weights=win_flags, minlength=len(uniques)).astype(np.int32)
+    x = np.maximum(noms, 1)
+    eff = (wins / x * 100).round(1)
+    r = np.clip(wins * 4, 4, 40).astype(np.int16)
+    points = [
+        {"artist": a, "x": n, "y": e, "r": rr}
+        for a, n, e, rr in zip(uniques.tolist(), x.tolist(), eff.tolist(), r.tolist())
+    ]
     scatter = {"datasets": [{"label": "Win Efficiency", "data": points}]}
 
-    # Big4 counts
-    big4_keywords = ['record of the year', 'album of the year', 'song of the year', 'best new artist']
-    cat_col = next((c for c in cols if 'category' in c.lower() or 'award' in c.lower()), None)
-    big4_counts = {}
+    # Big4 counts, reusing the artist codes; labels keep first-win order
+    big4_labels, big4_data = [], []
     if cat_col and artist_col:
-        for _, row in df.iterrows():
-            cat = str(row.get(cat_col, '')).lower()
-            if any(k in cat for k in big4_keywords):
-                artist = str(row.get(artist_col, 'Unknown'))
-                is_win = False
-                if winner_col and pd.notna(row.get(winner_col, None)):
-                    v = row[winner_col]
-                    if isinstance(v, str):
-                        is_win = 'win' in v.lower() or 'winner' in v.lower() or v.strip().lower() in ('yes','y','true','1')
-                    else:
-                        is_win = bool(v)
-                if is_win:
-                    big4_counts[artist] = big4_counts.get(artist, 0) + 1
-    big4_labels = list(big4_counts.keys())[:12] or ['No Data']
-    big4_data = [big4_counts.get(l, 0) for l in big4_labels]
+        is_big4 = df[cat_col].astype('string[pyarrow]').str.contains(BIG4_PATTERN, case=False, regex=True, na=False)
+        big4_codes = codes[(is_big4 & is_win).to_numpy(bool)]
+        big4_counts = np.bincount(big4_codes, minlength=len(uniques))
+        order = pd.unique(big4_codes)[:12]
+        big4_labels = uniques[order].tolist()
+        big4_data = big4_counts[order].tolist()
+    big4_labels = big4_labels or ['No Data']
+    big4_data = big4_data or [0]
 
     payload = {
         "polar": polar,
@@ -162,14 +222,71 @@ def build_payload(df: pd.DataFrame) -> Dict[str, Any]:
     return payload
 
 
+def load_grammy_payload() -> bytes:
+    with _LOAD_LOCK:
+        return _load_grammy_payload()
+
+
+@lru_cache(maxsize=1)
+def _load_grammy_payload() -> bytes:
+    # The dataframe never changes after load, so the serialized payload is constant
+    return orjson.dumps(build_payload(load_grammy_dataframe()), option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+@lru_cache(maxsize=1)
+def load_grammy_payload_gzip() -> bytes:
+    return gzip.compress(load_grammy_payload())
+
+
+@lru_cache(maxsize=1)
+def load_grammy_etag() -> str:
+    return hashlib.sha1(load_grammy_payload()).hexdigest()
+
+
+def warm_caches() -> None:
+    # Runs in a background thread at startup so the first request finds the caches filled
+    try:
+        load_grammy_payload()
+    except Exception:
+        pass  # the request path retries and reports the error
+
+
+@lru_cache(maxsize=2)
+def load_grammy_response(gzipped: bool) -> Response:
+    # allow local pages to fetch
+    headers = {'Access-Control-Allow-Origin': '*', 'Vary': 'Accept-Encoding'}
+    if gzipped:
+        headers['Content-Encoding'] = 'gzip'
+        body = load_grammy_payload_gzip()
+    else:
+        body = load_grammy_payload()
+    # Shared by every request for this encoding, so it must not be mutated per request
+    resp = Response(body, mimetype='application/json', headers=headers)
+    resp.set_etag(grammy_etag(gzipped))
+    resp.headers['Cache-Control'] = 'public, max-age=300'
+    resp.direct_passthrough = True
+    return resp
+
+
+def grammy_etag(gzipped: bool) -> str:
+    # Each encoding is a distinct representation and needs its own strong ETag
+    return load_grammy_etag() + ('-gzip' if gzipped else '')
+
+
+HEALTH_RESPONSE = Response(b'{"status":"ok"}', mimetype='application/json')
+HEALTH_RESPONSE.direct_passthrough = True
+
+
 @app.route('/api/grammy')
 def api_grammy():
     try:
-        df = load_grammy_dataframe()
-        payload = build_payload(df)
-        resp = make_response(jsonify(payload))
-        # allow local pages to fetch
-        resp.headers['Access-Control-Allow-Origin'] = '*'
+        # 'in' ignores quality values, so gzip;q=0 would still match
+        gzipped = request.accept_encodings['gzip'] > 0
+        resp = load_grammy_response(gzipped)
+        # If-None-Match uses weak comparison, so W/"..." tags from proxies still revalidate
+        if request.if_none_match.contains_weak(grammy_etag(gzipped)):
+            keep = ('ETag', 'Cache-Control', 'Vary', 'Access-Control-Allow-Origin')
+            return Response(status=304, headers={k: v for k, v in resp.headers.items() if k in keep})
         return resp
     except Exception as e:
         return make_response(jsonify({"error": str(e)}), 500)
@@ -177,8 +294,9 @@ def api_grammy():
 
 @app.route('/health')
 def health():
-    return jsonify({"status": "ok"})
+    return HEALTH_RESPONSE
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    threading.Thread(target=warm_caches, daemon=True).start()
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for serving the Grammy API in production.
+
+Usage:
+  gunicorn -c gunicorn_conf.py grammy_server:app
+  GRAMMY_FETCHER=croissant gunicorn -c gunicorn_conf.py grammy_server:app
+
+With preload_app the dataset and the cached payload/response bytes are built
+once in the master process and shared copy-on-write with the forked workers.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+preload_app = True
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, os.cpu_count() or 1)))
+threads = 4
+
+
+def when_ready(server):
+    # Fill the caches in the master before workers fork, so each worker inherits them
+    import grammy_server
+    grammy_server.warm_caches()